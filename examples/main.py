@@ -4,7 +4,7 @@ from firestore_model import Model
 from google.cloud import firestore
 
 # Initialize connection to the database
-firestore_model.db = firestore.Client()
+firestore_model.set_db(firestore.Client())
 
 # Create a model class
 @dataclass
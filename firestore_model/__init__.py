@@ -1,8 +1,25 @@
+import contextlib
+import copy
 import functools
-import uuid
-from dataclasses import asdict, dataclass
+import json
+import secrets
+import threading
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, fields, is_dataclass
 from datetime import datetime, timezone
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # --------------------------------------------
 #
 #  The main database client reference
@@ -10,6 +27,21 @@ from datetime import datetime, timezone
 # -------------------------------------------
 db = None
 
+# Firestore rejects batched writes containing more than this many operations
+MAX_BATCH_SIZE = 500
+
+# Number of batch commits Model.save_many keeps in flight at once
+MAX_CONCURRENT_COMMITS = 4
+
+# Number of threads used to fetch documents concurrently in Model.get_many
+MAX_WORKERS = 40
+
+# Number of seconds documents read by Model.get stay in the local cache
+DOC_CACHE_TTL = 60
+
+# Holds the batch opened by Model.batch() for the current thread
+_local = threading.local()
+
 
 # --------------------------------------------
 #
@@ -23,6 +55,43 @@ def to_collection_name(cls):
     return f"{cls.lower()}s"
 
 
+def set_db(client):
+    """ Set the database client used by all models
+    @param client
+        A google.cloud.firestore.Client, or None
+
+    The document and query caches, and the collection references cached by models,
+    are tied to the client they were filled from. They are emptied here, and also on
+    next use if firestore_model.db is assigned directly instead.
+    """
+    global db
+    db = client
+    _reset_caches(client)
+
+
+def _reset_caches(client):
+    """ Empty the document and query caches if they were filled from another client """
+    global _caches_client
+    if client is not _caches_client:
+        _doc_cache.clear()
+        _query_cache.clear()
+        _caches_client = client
+
+
+def _client():
+    """ The database client
+    @raises Exception
+        If firestore_model.db has not been set
+    @return The database client
+
+    Model methods reach the database through Model._coll or _Batch, which call this,
+    so each call checks for the client exactly once without a decorator.
+    """
+    if db is None:
+        raise Exception("Database is not defined.")
+    return db
+
+
 def require_database(f, *args, **kwargs):
     """ Decorator for methods that access the database
     @raises Exception
@@ -31,14 +100,149 @@ def require_database(f, *args, **kwargs):
 
     @functools.wraps(f)
     def wrapper(*args, **kwargs):
-        if db is None:
-            raise Exception("Database is not defined.")
-        else:
-            return f(*args, **kwargs)
+        _client()
+        return f(*args, **kwargs)
 
     return wrapper
 
 
+def _json_default(value):
+    """ Encode values the json module doesn't support the same way orjson does """
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _current_batch():
+    """ The batch opened by Model.batch() on this thread, or None """
+    return getattr(_local, "batch", None)
+
+
+# --------------------------------------------
+#
+#  Code generation
+#
+# -------------------------------------------
+
+# Field types that Firestore stores as-is and that never need converting
+_PRIMITIVES = (str, int, float, bool, bytes, datetime)
+
+
+def _to_plain(value):
+    """ Convert nested dataclasses and containers the way dataclasses.asdict does
+    """
+    if is_dataclass(value) and not isinstance(value, type):
+        return asdict(value)
+    if isinstance(value, tuple) and hasattr(value, "_fields"):
+        return type(value)(*[_to_plain(v) for v in value])
+    if isinstance(value, (list, tuple)):
+        return type(value)(_to_plain(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _to_plain(v) for k, v in value.items()}
+    return value
+
+
+@functools.lru_cache(maxsize=None)
+def _field_names(cls):
+    """ The names of all fields on a dataclass, in declaration order """
+    return tuple(f.name for f in fields(cls))
+
+
+@functools.lru_cache(maxsize=None)
+def _field_set(cls):
+    return frozenset(_field_names(cls))
+
+
+@functools.lru_cache(maxsize=None)
+def _init_field_set(cls):
+    """ The names of the fields accepted by a dataclass's __init__ """
+    return frozenset(f.name for f in fields(cls) if f.init)
+
+
+@functools.lru_cache(maxsize=None)
+def _type_hints(cls):
+    """ Resolved type hints for a class, or an empty dict if they can't be resolved """
+    try:
+        return typing.get_type_hints(cls)
+    except Exception:
+        return {}
+
+
+def _hydrate(cls, data):
+    """ Create an instance of cls from a dictionary of field values
+    @param cls
+        The model class to instantiate
+    @param data
+        A dictionary, typically from DocumentSnapshot.to_dict()
+    @return cls
+        A new instance of cls. Keys that aren't fields of cls are ignored, missing
+        fields fall back to their defaults
+
+    This is the general path used by the generated from_dict functions when a
+    document doesn't have every field.
+    """
+    return cls(**{k: data[k] for k in data.keys() & _init_field_set(cls)})
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_from_dict(cls):
+    """ Generate a from_dict function for a model class
+    @param cls
+        The dataclass to generate the function for
+    @return Function
+        A function taking a dictionary of field values and returning an instance of cls
+
+    The generated function passes every field straight from the dictionary to
+    __init__, positionally where possible. If a field is missing it falls back to
+    _hydrate.
+    """
+    args = []
+    for f in fields(cls):
+        if not f.init:
+            continue
+        if getattr(f, "kw_only", False):
+            args.append(f"{f.name}=d[{f.name!r}]")
+        else:
+            args.append(f"d[{f.name!r}]")
+
+    source = (
+        "def from_dict(d):\n"
+        "    if d.keys() >= _fields:\n"
+        f"        return _cls({', '.join(args)})\n"
+        "    return _hydrate(_cls, d)\n"
+    )
+    namespace = {"_cls": cls, "_fields": _init_field_set(cls), "_hydrate": _hydrate}
+    exec(source, namespace)
+    return namespace["from_dict"]
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_to_dict(cls):
+    """ Generate a flat to_dict function for a model class
+    @param cls
+        The dataclass to generate the function for
+    @return Function
+        A function taking an instance of cls and returning a dictionary of its fields
+
+    Fields annotated with a primitive type are copied straight into the dictionary,
+    anything else goes through _to_plain, so models with only primitive fields get a
+    single dict literal. This is compiled on first use rather than in __init_subclass__
+    because the @dataclass decorator has not processed the subclass at that point.
+    """
+    hints = _type_hints(cls)
+    items = []
+    for name in _field_names(cls):
+        if hints.get(name) in _PRIMITIVES:
+            items.append(f"{name!r}: self.{name}")
+        else:
+            items.append(f"{name!r}: _to_plain(self.{name})")
+
+    source = "def to_dict(self):\n    return {" + ", ".join(items) + "}\n"
+    namespace = {"_to_plain": _to_plain}
+    exec(source, namespace)
+    return namespace["to_dict"]
+
+
 # --------------------------------------------
 #
 #  Classes
@@ -46,11 +250,141 @@ def require_database(f, *args, **kwargs):
 # -------------------------------------------
 
 
+class _Batch(object):
+    """ Collects writes and commits them in chunks of at most MAX_BATCH_SIZE
+
+    If an executor is given, commits are submitted to it so the next chunk can be
+    built while earlier ones are in flight. Call wait to collect their results.
+    """
+
+    def __init__(self, executor=None):
+        self.batch = _client().batch()
+        self.count = 0
+        self.executor = executor
+        self.pending = []
+        self.paths = []
+
+    def set(self, doc_ref, data):
+        self.batch.set(doc_ref, data)
+        self.paths.append(doc_ref.path)
+        self._added()
+
+    def delete(self, doc_ref):
+        self.batch.delete(doc_ref)
+        self.paths.append(doc_ref.path)
+        self._added()
+
+    def _added(self):
+        self.count += 1
+        if self.count >= MAX_BATCH_SIZE:
+            self.commit()
+
+    def commit(self):
+        """ Commit any pending writes and start a new batch """
+        if self.count:
+            if self.executor is None:
+                self._commit(self.batch, self.paths)
+            else:
+                self.pending.append(
+                    self.executor.submit(self._commit, self.batch, self.paths)
+                )
+            self.batch = db.batch()
+            self.count = 0
+            self.paths = []
+
+    @staticmethod
+    def _commit(batch, paths):
+        """ Commit a batch, then drop the documents it wrote from the local cache """
+        batch.commit()
+        for path in paths:
+            _doc_cache.pop(path)
+
+    def wait(self):
+        """ Wait for commits submitted to the executor, raising the first error """
+        pending, self.pending = self.pending, []
+        for future in pending:
+            future.result()
+
+
+class _TTLCache(object):
+    """ A small thread safe cache whose entries expire after a number of seconds
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """ The value stored for key, or None if it is missing or has expired """
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.data[key]
+                return None
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.data.pop(key, None)
+            if len(self.data) >= self.maxsize:
+                now = time.monotonic()
+                for k in [k for k, entry in self.data.items() if entry[0] < now]:
+                    del self.data[k]
+            if len(self.data) >= self.maxsize:
+                # dicts keep insertion order, so this evicts the oldest entry
+                del self.data[next(iter(self.data))]
+            self.data[key] = (time.monotonic() + ttl, value)
+
+    def pop(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+# Document data returned by cached queries, keyed by model class, collection and
+# query params
+_query_cache = _TTLCache()
+
+# Document data read by Model.get, keyed by document path
+_doc_cache = _TTLCache(maxsize=4096)
+
+# The client whose documents are currently held in the caches above
+_caches_client = None
+
+
+def _set_doc(doc_ref, data):
+    """ Write data to a document, or queue the write on the current batch """
+    batch = _current_batch()
+    if batch is not None:
+        return batch.set(doc_ref, data)
+    result = doc_ref.set(data)
+    _doc_cache.pop(doc_ref.path)
+    return result
+
+
+def _delete_doc(doc_ref):
+    """ Delete a document, or queue the delete on the current batch """
+    batch = _current_batch()
+    if batch is not None:
+        return batch.delete(doc_ref)
+    result = doc_ref.delete()
+    _doc_cache.pop(doc_ref.path)
+    return result
+
+
 class Query(object):
     """ A class representing a query on a collection
     """
 
-    def __init__(self, cls, query_params, collection_path: str = None):
+    def __init__(
+        self, cls, query_params, collection_path: str = None, cache_ttl: float = None
+    ):
         """
         @param cls
             The model class to run the query on
@@ -59,6 +393,10 @@ class Query(object):
             value)
         @param collection_path
             Override default collection
+        @param cache_ttl
+            Cache the results of get for this many seconds. Cached documents are
+            shared by every query with the same class, collection and params, and are
+            only used while self.q has not been replaced. Each get returns new instances
 
         While possible, this method is not intended to be called by itself. The intended
         use is from within the Model.query method.
@@ -81,33 +419,154 @@ class Query(object):
           https://googleapis.github.io/google-cloud-python/latest/firestore/query.html
         """
         self.cls = cls
-        self.result = None
 
-        self.q = (
-            db.collection(collection_path)
-            if collection_path
-            else db.collection(to_collection_name(cls.__name__))
-        )
+        self.q = cls._coll(collection_path)
 
         # parse the params
+        params = []
         for param in query_params:
             if len(param) == 2:
-                self.q = self.q.where(param[0], "==", param[1])
+                params.append((param[0], "==", param[1]))
             if len(param) == 3:
-                self.q = self.q.where(*param)
+                params.append(tuple(param))
+        for param in params:
+            self.q = self.q.where(*param)
+
+        self.cache_ttl = cache_ttl
+        self.cache_key = None
+        if cache_ttl:
+            self.cache_key = (
+                cls,
+                collection_path or to_collection_name(cls.__name__),
+                tuple(sorted(repr(param) for param in params)),
+            )
+        self._uncached_q = self.q
 
     def get(self):
         """ Executes the query
-        @return Generator
-            Generator object that yields hydrated instances of the class supplied
-        __init__
+        @return Iterator
+            Iterator that yields hydrated instances of the class supplied to __init__
+        """
+        if self.cache_key is None or self.q is not self._uncached_q:
+            return self._get()
+
+        documents = _query_cache.get(self.cache_key)
+        if documents is None:
+            documents = [r.to_dict() for r in self.q.stream()]
+            _query_cache.set(self.cache_key, documents, self.cache_ttl)
+        # hydrate copies so callers never share instances or values with the cache
+        return map(self.cls.from_dict, copy.deepcopy(documents))
+
+    def select(self, *field_names):
+        """ Only fetch the given fields of each document
+        @param field_names
+            The names of the fields to fetch
+        @return Query
+            This query, to allow chaining
+
+        Documents are hydrated from the selected fields only, so id, created, modified
+        and collection_path must always be selected, and any other field that isn't
+        selected must have a default value on the model class.
+        """
+        self.q = self.q.select(list(field_names))
+        return self
+
+    def materialize(self):
+        """ Executes the query and hydrates every result at once
+        @return list
+            A list of hydrated instances of the class supplied to __init__
+
+        Cheaper than iterating over get when all of the results are needed anyway, but
+        holds every result in memory. Queries made with cache_ttl are served from the
+        query cache, the same as get.
+        """
+        if self.cache_key is not None and self.q is self._uncached_q:
+            return list(self.get())
+        from_dict = self.cls.from_dict
+        return [from_dict(r.to_dict()) for r in self.q.stream()]
+
+    def _get(self):
+        from_dict = self.cls.from_dict
+        for r in self.q.stream():
+            yield from_dict(r.to_dict())
+
+    def get_columns(self, field_names):
+        """ Executes the query and collects the requested fields column by column
+        @param field_names
+            The names of the fields to collect
+        @return Dict
+            A dictionary mapping each field name to a list of its values, one per
+            document. If numpy is installed, fields annotated as int or float whose
+            value is of exactly that type in every document are returned as numpy
+            arrays instead
+
+        Only the requested fields are fetched, and no model instance is created per
+        document, which is much cheaper for scans that only look at a few fields.
+
+        Examples:
+          columns = Book.query([('author', 'Kurt Vonnegut')]).get_columns(
+            ['title', 'year', 'pages']
+          )
+          mask = (columns['year'] >= 1959) & (columns['pages'] < 400)
+        """
+        columns = {name: [] for name in field_names}
+        appends = [(name, columns[name].append) for name in columns]
+        for r in self.q.select(list(columns)).stream():
+            data = r.to_dict()
+            for name, append in appends:
+                append(data.get(name))
+
+        if numpy is not None:
+            hints = _type_hints(self.cls)
+            for name, values in columns.items():
+                hint = hints.get(name)
+                if hint in (int, float) and all(type(v) is hint for v in values):
+                    columns[name] = numpy.array(values, dtype=hint)
+        return columns
+
+    @staticmethod
+    def filter_numeric(columns, predicate, field_names):
+        """ Filter the columns returned by get_columns with a vectorised predicate
+        @param columns
+            A dictionary of columns, as returned by get_columns
+        @param predicate
+            A function taking the columns named in field_names as positional arguments
+            and returning a boolean mask with one entry per document
+        @param field_names
+            The names of the columns to pass to predicate
+        @return Dict
+            A new dictionary with the same keys as columns, keeping only the documents
+            for which the mask is true
+        @raises ValueError
+            If the mask doesn't have one entry per document
+
+        The predicate only ever sees flat arrays, so it can be compiled with numba.
+        Model instances should not be passed to numba functions.
+
+        Examples:
+          @numba.njit(cache=True, parallel=True)
+          def published_short(years, pages):
+            mask = numpy.empty(len(years), dtype=numpy.bool_)
+            for i in numba.prange(len(years)):
+              mask[i] = years[i] >= 1959 and pages[i] < 400
+            return mask
+
+          columns = query.get_columns(['title', 'year', 'pages'])
+          columns = Query.filter_numeric(columns, published_short, ['year', 'pages'])
         """
-        self.result = self.q.get()
-        for r in self.result:
-            if hasattr(self.cls, "from_dict"):
-                yield self.cls.from_dict(r.to_dict())
+        mask = predicate(*[columns[name] for name in field_names])
+        for name, values in columns.items():
+            if len(mask) != len(values):
+                raise ValueError(
+                    f"Mask has {len(mask)} entries but column {name!r} has {len(values)}"
+                )
+        result = {}
+        for name, values in columns.items():
+            if numpy is not None and isinstance(values, numpy.ndarray):
+                result[name] = values[mask]
             else:
-                yield self.cls(**r.to_dict())
+                result[name] = [v for v, keep in zip(values, mask) if keep]
+        return result
 
 
 @dataclass
@@ -122,20 +581,35 @@ class Model:
     # -------------------------------------------
 
     @classmethod
-    @require_database
-    def delete_doc(cls, doc_id, collection_path: str = None):
+    def delete_doc(cls, doc_id, collection_path: str = None, raise_exception=True):
+        """ Delete a document by id
+        @param cls
+            The class of the document being deleted
+        @param doc_id
+            The id of the document to delete
+        @param collection_path
+            Override the default collection path
+        @param raise_exception
+            whether to raise exception or return None
+        @return
+            The result of the delete, or None if it failed and raise_exception is False
+        """
+        doc_ref = cls._coll(collection_path).document(doc_id)
         try:
-            _collection_path = (
-                collection_path if collection_path else to_collection_name(cls.__name__)
-            )
-            result = db.collection(_collection_path).document(doc_id).delete()
-        except Exception as e:
-            print(e)
-        return result
+            return _delete_doc(doc_ref)
+        except Exception:
+            if raise_exception:
+                raise
+            return None
 
     @classmethod
-    @require_database
-    def get(cls, doc_id, collection_path: str = None, raise_exception=False):
+    def get(
+        cls,
+        doc_id,
+        collection_path: str = None,
+        raise_exception=True,
+        source: str = "server",
+    ):
         """ Get a single model instance
         @param cls
             The class of the instance calling make
@@ -143,27 +617,185 @@ class Model:
             The id of the document to get
         @param collection_path
             Override the default collection path
+        @param raise_exception
+            whether to raise exception or return None
+        @param source
+            "server" (or "default") always reads from Firestore and leaves the local
+            cache alone. "cache" first looks in a local cache of documents read with
+            source="cache" within the last DOC_CACHE_TTL seconds. Writes made through
+            this process remove the document from the cache once committed
         @return model
-            A model instance of type class hydrated w/ data from the database
+            A model instance of type class hydrated w/ data from the database, or None
+            if the document doesn't exist
         """
+        if source not in ("default", "server", "cache"):
+            raise ValueError(f"Unknown source: {source}")
+        doc_ref = cls._coll(collection_path).document(doc_id)
         try:
-            _collection_path = (
-                collection_path if collection_path else to_collection_name(cls.__name__)
-            )
-            doc_ref = db.collection(_collection_path).document(doc_id).get()
-            return cls(**doc_ref.to_dict())
-        except Exception as e:
+            if source != "cache":
+                snapshot = doc_ref.get()
+                return cls.from_dict(snapshot.to_dict()) if snapshot.exists else None
+
+            data = _doc_cache.get(doc_ref.path)
+            if data is None:
+                snapshot = doc_ref.get()
+                if not snapshot.exists:
+                    return None
+                data = snapshot.to_dict()
+                _doc_cache.set(doc_ref.path, data, DOC_CACHE_TTL)
+            # instances must not share mutable values with the cache
+            return cls.from_dict(copy.deepcopy(data))
+        except Exception:
             if raise_exception:
-                raise e
+                raise
             return None
 
+    @classmethod
+    def get_many(cls, doc_ids, collection_path: str = None, max_workers=MAX_WORKERS):
+        """ Get several model instances concurrently
+        @param cls
+            The class of the instances to get
+        @param doc_ids
+            An iterable of document ids
+        @param collection_path
+            Override the default collection path
+        @param max_workers
+            The number of documents to fetch at the same time
+        @return list
+            Model instances for the documents that exist, in the order they arrived
+
+        If any read fails, reads that haven't started yet are cancelled and the
+        exception is raised.
+        """
+        collection = cls._coll(collection_path)
+        from_dict = cls.from_dict
+        results = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(collection.document(doc_id).get) for doc_id in doc_ids
+            ]
+            for future in as_completed(futures):
+                try:
+                    snapshot = future.result()
+                except Exception:
+                    for f in futures:
+                        f.cancel()
+                    raise
+                if snapshot.exists:
+                    results.append(from_dict(snapshot.to_dict()))
+        return results
+
+    @classmethod
+    def save_many(cls, instances):
+        """ Save several model instances using batched writes
+        @param cls
+            The class of the instances being saved
+        @param instances
+            An iterable of model instances
+        @return list
+            The saved instances
+
+        Writes are committed in batches of at most MAX_BATCH_SIZE operations, so each
+        batch is written atomically but the call as a whole is not. Up to
+        MAX_CONCURRENT_COMMITS batches are committed at the same time while the next
+        one is being built, unless the same document is saved more than once, in which
+        case batches are committed one after another to keep the last write winning.
+        """
+        instances = list(instances)
+        outer = _current_batch()
+        documents = {(instance.collection_path, instance.id) for instance in instances}
+        workers = MAX_CONCURRENT_COMMITS if len(documents) == len(instances) else 1
+        modified = datetime.now(timezone.utc)
+        if outer is None and len(instances) > MAX_BATCH_SIZE:
+            pool = ThreadPoolExecutor(max_workers=workers)
+        else:
+            # A single commit, or writes joining an outer batch, gain nothing from threads
+            pool = contextlib.nullcontext()
+        with pool as executor:
+            batch = outer or _Batch(executor)
+            for instance in instances:
+                instance.modified = modified
+                batch.set(
+                    instance._coll(instance.collection_path).document(instance.id),
+                    instance.to_dict(),
+                )
+            if batch is not outer:
+                batch.commit()
+                batch.wait()
+        return instances
+
+    @classmethod
+    def delete_many(cls, doc_ids, collection_path: str = None):
+        """ Delete several documents using batched writes
+        @param cls
+            The class of the documents being deleted
+        @param doc_ids
+            An iterable of document ids
+        @param collection_path
+            Override the default collection path
+        """
+        collection = cls._coll(collection_path)
+        batch = _current_batch() or _Batch()
+        for doc_id in doc_ids:
+            batch.delete(collection.document(doc_id))
+        if batch is not _current_batch():
+            batch.commit()
+
+    @classmethod
+    @contextlib.contextmanager
+    def batch(cls):
+        """ Context manager that groups writes made on this thread into batches
+
+        Calls to save, set, delete and delete_doc inside the block are queued and
+        committed when the block exits, in batches of at most MAX_BATCH_SIZE
+        operations. Nothing left in the queue is committed if the block raises.
+        Nested blocks join the outermost one.
+
+        Examples:
+            with Model.batch():
+                for user in users:
+                    user.save()
+        """
+        if _current_batch() is not None:
+            yield _current_batch()
+            return
+
+        _local.batch = _Batch()
+        try:
+            yield _local.batch
+            _local.batch.commit()
+        finally:
+            _local.batch = None
+
+    @classmethod
+    def _coll(cls, collection_path: str = None):
+        """ Get a reference to a collection
+        @param cls
+            The model class
+        @param collection_path
+            The collection to reference, defaults to the collection for cls
+        @return CollectionReference
+
+        The reference to the default collection is cached on the class and reused for
+        as long as firestore_model.db is the same client.
+        """
+        db = _client()
+        if db is not _caches_client:
+            _reset_caches(db)
+        cached = cls.__dict__.get("_collection")
+        if cached is None or cached[0] is not db:
+            name = to_collection_name(cls.__name__)
+            cached = cls._collection = (db, name, db.collection(name))
+        if collection_path and collection_path != cached[1]:
+            return db.collection(collection_path)
+        return cached[2]
+
     @classmethod
     def make(
         cls,
         doc_id: str = None,
         collection_path: str = None,
         save=False,
-        *args,
         **kwargs,
     ):
         """ Create a new instance of a model class
@@ -175,6 +807,8 @@ class Model:
             Override collection path
         @param save
             A flag indicating the model should be saved immediately after creation
+        @param kwargs
+            Values for the fields of cls, passed by name
         @returns cls
             A new model instance of type cls
 
@@ -193,23 +827,24 @@ class Model:
                 save = True
               )
         """
-        id_str = doc_id if doc_id else str(uuid.uuid4())
         created = datetime.now(timezone.utc)
-        modified = created
-        _collection_path = (
-            collection_path if collection_path else to_collection_name(cls.__name__)
+        model = cls(
+            id=doc_id if doc_id else secrets.token_hex(16),
+            created=created,
+            modified=created,
+            collection_path=(
+                collection_path if collection_path else to_collection_name(cls.__name__)
+            ),
+            **kwargs,
         )
 
-        model = cls(id_str, created, modified, _collection_path, *args, **kwargs)
-
         if save:
             model.save()
 
         return model
 
     @classmethod
-    @require_database
-    def query(cls, q=(), collection_path: str = None):
+    def query(cls, q=(), collection_path: str = None, cache_ttl: float = None):
         """ Get a handle to a query object (see Query helper class above)
         @param cls
             The class of the instance calling make
@@ -217,8 +852,10 @@ class Model:
             A list of query key/value or key/operator/value pairs
         @param collection_path
             Override collection path
+        @param cache_ttl
+            Cache the query results in memory for this many seconds
         """
-        return Query(cls, q, collection_path=collection_path)
+        return Query(cls, q, collection_path=collection_path, cache_ttl=cache_ttl)
 
     # --------------------------------------------
     #
@@ -231,43 +868,77 @@ class Model:
     modified: int
     collection_path: str
 
-    @require_database
-    def delete(self, raise_exception=False):
+    def delete(self, raise_exception=True):
         """ Removes this model from Cloud Datastore
         @param raise_exception
             whether to raise exception or boolean
         @raises Exception or boolean
             indicating that deletion failed
         """
+        doc_ref = self._coll(self.collection_path).document(self.id)
         try:
-            db.collection(self.collection_path).document(self.id).delete()
+            _delete_doc(doc_ref)
             return True
-        except Exception as e:
+        except Exception:
             if raise_exception:
-                raise e
-            print(e)
+                raise
             return False
 
-    @require_database
     def save(self):
         """ Saves this model to Cloud Firestore """
-        return self.set(asdict(self))
+        self._write()
+        return self
 
-    @require_database
     def set(self, kvs):
-        """ Set values on this model
+        """ Set values on this model and save it
         @param kvs
             A dictionary containing key value pairs to set on this model.
 
         Unrecognized keys are ignored
         """
-        for k, v in kvs.items():
-            if hasattr(self, k):
-                setattr(self, k, v)
-        self.modified = datetime.now(timezone.utc)
-        db.collection(self.collection_path).document(self.id).set(asdict(self))
+        self.update(kvs)._write()
+        return self
+
+    def update(self, kvs):
+        """ Set values on this model without saving it
+        @param kvs
+            A dictionary containing key value pairs to set on this model.
+
+        Keys that aren't fields of this model are ignored
+        """
+        cls = type(self)
+        if hasattr(cls, "__slots__"):
+            # slot descriptors take precedence over the instance __dict__
+            for k in kvs.keys() & _field_set(cls):
+                setattr(self, k, kvs[k])
+        else:
+            for k in kvs.keys() & _field_set(cls):
+                self.__dict__[k] = kvs[k]
         return self
 
+    def _write(self):
+        """ Stamp the modified time and write this model to its document, or queue the
+        write on the current batch
+        """
+        payload = self.to_dict()
+        self.modified = payload["modified"] = datetime.now(timezone.utc)
+        _set_doc(self._coll(self.collection_path).document(self.id), payload)
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Create an instance of this model from a dictionary
+        @param cls
+            The class of the instance to create
+        @param data
+            A dictionary of field values, typically from DocumentSnapshot.to_dict()
+        @return cls
+            A new model instance. Keys that aren't fields of cls are ignored
+
+        get, get_many and queries use this to hydrate documents, so subclasses can
+        override it to customise decoding.
+        """
+        return _compile_from_dict(cls)(data)
+
     def to_dict(self):
         """ A convenience function that converts this model into a dictionary
         representation
@@ -275,12 +946,29 @@ class Model:
         @return Dict
             A Dictionary of key value pairs representing this model
         """
-        return asdict(self)
+        return _compile_to_dict(type(self))(self)
+
+    def to_json_bytes(self):
+        """ Serialize this model to JSON, e.g. for logging or a secondary store
+        @return bytes
+            UTF-8 encoded JSON representing this model
+
+        Serializes the result of to_dict. Uses orjson when it is installed and
+        otherwise falls back to the json module. Both write compact JSON with non-ASCII
+        characters unescaped and datetimes in ISO 8601 format, but they differ on edge
+        cases: orjson writes NaN and infinity as null, and raises on integers wider
+        than 64 bits and on non-string dictionary keys.
+        """
+        data = self.to_dict()
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(
+            data, default=_json_default, ensure_ascii=False, separators=(",", ":")
+        ).encode()
 
-    @require_database
     def doc(self):
-        return db.collection(self.collection_path).document(self.id)
+        return self._coll(self.collection_path).document(self.id)
 
-    @require_database
     def collection(self, collection_path):
+        db = _client()
         return db.collection(collection_path)
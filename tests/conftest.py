@@ -0,0 +1,117 @@
+import copy
+import threading
+
+import pytest
+
+import firestore_model
+
+
+class FakeSnapshot(object):
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+
+class FakeDocument(object):
+    def __init__(self, client, collection, doc_id):
+        self.client = client
+        self.collection = collection
+        self.id = doc_id
+        self.path = f"{collection}/{doc_id}"
+
+    def get(self):
+        self.client.reads += 1
+        if self.id in self.client.fail_ids:
+            raise RuntimeError(f"failed to read {self.id}")
+        return FakeSnapshot(self.id, self.client.store(self.collection).get(self.id))
+
+    def set(self, data):
+        self.client.store(self.collection)[self.id] = copy.deepcopy(data)
+
+    def delete(self):
+        self.client.store(self.collection).pop(self.id, None)
+
+
+class FakeQuery(object):
+    def __init__(self, client, collection, filters=(), field_names=None):
+        self.client = client
+        self.collection = collection
+        self.filters = tuple(filters)
+        self.field_names = field_names
+
+    def where(self, field, op, value):
+        assert op == "=="
+        filters = self.filters + ((field, value),)
+        return FakeQuery(self.client, self.collection, filters, self.field_names)
+
+    def select(self, field_names):
+        return FakeQuery(self.client, self.collection, self.filters, list(field_names))
+
+    def stream(self):
+        self.client.streams += 1
+        if self.field_names is not None:
+            self.client.projections.append(self.field_names)
+        for doc_id, data in list(self.client.store(self.collection).items()):
+            if all(data.get(k) == v for k, v in self.filters):
+                if self.field_names is not None:
+                    data = {k: data[k] for k in self.field_names if k in data}
+                yield FakeSnapshot(doc_id, data)
+
+
+class FakeCollection(FakeQuery):
+    def document(self, doc_id):
+        return FakeDocument(self.client, self.collection, doc_id)
+
+
+class FakeBatch(object):
+    def __init__(self, client):
+        self.client = client
+        self.ops = []
+
+    def set(self, doc_ref, data):
+        data = copy.deepcopy(data)
+        self.ops.append(lambda: doc_ref.set(data))
+
+    def delete(self, doc_ref):
+        self.ops.append(doc_ref.delete)
+
+    def commit(self):
+        assert len(self.ops) <= firestore_model.MAX_BATCH_SIZE
+        with self.client.lock:
+            for op in self.ops:
+                op()
+            self.client.commits.append(len(self.ops))
+
+
+class FakeClient(object):
+    """ An in-memory stand-in for google.cloud.firestore.Client """
+
+    def __init__(self):
+        self.data = {}
+        self.commits = []
+        self.fail_ids = set()
+        self.reads = 0
+        self.streams = 0
+        self.projections = []
+        self.lock = threading.Lock()
+
+    def store(self, collection):
+        return self.data.setdefault(collection, {})
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+@pytest.fixture
+def db():
+    client = FakeClient()
+    firestore_model.set_db(client)
+    yield client
+    firestore_model.set_db(None)
@@ -0,0 +1,437 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import List
+
+import pytest
+
+import firestore_model
+from firestore_model import Model
+
+
+@dataclass
+class Author:
+    name: str
+
+
+@dataclass
+class Book(Model):
+    title: str
+    author: str = ""
+    year: int = 0
+    pages: int = 0
+    tags: List[str] = field(default_factory=list)
+    authors: List[Author] = field(default_factory=list)
+
+
+@dataclass
+class Flat(Model):
+    name: str
+    count: int = 0
+
+
+# --------------------------------------------
+#
+#  Serialisation
+#
+# -------------------------------------------
+
+
+def test_to_dict_matches_asdict():
+    b = Book.make(title="Sirens of Titan", tags=["sf"], authors=[Author("Kurt")])
+    assert b.to_dict() == asdict(b)
+    assert b.to_dict()["authors"] == [{"name": "Kurt"}]
+
+
+def test_to_dict_ignores_attributes_that_are_not_fields():
+    f = Flat.make(name="a")
+    f.extra = "x"
+    assert "extra" not in f.to_dict()
+    assert b"extra" not in f.to_json_bytes()
+
+
+def test_to_json_bytes_is_the_same_with_and_without_orjson(monkeypatch):
+    pytest.importorskip("orjson")
+    b = Book.make(title="Café", authors=[Author("Kurt")])
+    encoded = b.to_json_bytes()
+    monkeypatch.setattr(firestore_model, "orjson", None)
+    assert b.to_json_bytes() == encoded
+    assert "Café".encode() in encoded
+
+
+def test_to_json_bytes_uses_to_dict(monkeypatch):
+    monkeypatch.setattr(firestore_model, "orjson", None)
+
+    @dataclass
+    class Custom(Model):
+        name: str
+
+        def to_dict(self):
+            return {"name": self.name.upper()}
+
+    assert Custom.make(name="café").to_json_bytes() == '{"name":"CAFÉ"}'.encode()
+
+
+def test_from_dict_round_trip_ignores_unknown_keys():
+    b = Book.make(title="Cat's Cradle", year=1963)
+    data = dict(b.to_dict(), unknown=1)
+    assert Book.from_dict(data) == Book(**asdict(b))
+
+
+def test_from_dict_uses_defaults_for_missing_fields():
+    b = Book.make(title="Slapstick")
+    data = b.to_dict()
+    del data["year"]
+    assert Book.from_dict(data).year == 0
+
+
+def test_from_dict_does_not_retry_key_errors_from_post_init():
+    calls = []
+
+    @dataclass
+    class Strict(Model):
+        def __post_init__(self):
+            calls.append(1)
+            raise KeyError("boom")
+
+    data = {"id": "a", "created": 0, "modified": 0, "collection_path": "stricts"}
+    with pytest.raises(KeyError):
+        Strict.from_dict(data)
+    assert len(calls) == 1
+
+
+def test_update_ignores_unknown_keys_and_methods():
+    f = Flat.make(name="a")
+    f.update({"name": "b", "save": 1, "unknown": 2})
+    assert f.name == "b"
+    assert callable(f.save)
+    assert not hasattr(f, "unknown")
+
+
+def test_update_sets_slotted_fields():
+    @dataclass(slots=True)
+    class Slotted(Model):
+        x: int = 1
+
+    s = Slotted.make()
+    s.update({"x": 5})
+    assert s.x == 5
+    assert s.to_dict()["x"] == 5
+
+
+# --------------------------------------------
+#
+#  Reads and writes
+#
+# -------------------------------------------
+
+
+def test_requires_database():
+    with pytest.raises(Exception, match="Database is not defined"):
+        Flat.get("a", raise_exception=False)
+    with pytest.raises(Exception, match="Database is not defined"):
+        Flat.make(name="a").save()
+
+
+def test_save_and_get(db):
+    f = Flat.make(name="a", save=True)
+    assert Flat.get(f.id) == f
+    assert Flat.get("missing") is None
+
+
+def test_get_many_skips_missing_documents(db):
+    saved = [Flat.make(name=str(i), save=True) for i in range(10)]
+    found = Flat.get_many([f.id for f in saved] + ["missing"])
+    assert sorted(f.id for f in found) == sorted(f.id for f in saved)
+
+
+def test_get_many_raises_read_errors(db):
+    saved = [Flat.make(name=str(i), save=True) for i in range(10)]
+    db.fail_ids.add(saved[3].id)
+    with pytest.raises(RuntimeError, match="failed to read"):
+        Flat.get_many([f.id for f in saved])
+
+
+def test_delete_raises_by_default(db, monkeypatch):
+    f = Flat.make(name="a", save=True)
+
+    def fail(self):
+        raise RuntimeError("nope")
+
+    monkeypatch.setattr(type(f.doc()), "delete", fail)
+    with pytest.raises(RuntimeError):
+        f.delete()
+    assert f.delete(raise_exception=False) is False
+    assert Flat.delete_doc(f.id, raise_exception=False) is None
+
+
+# --------------------------------------------
+#
+#  Batches
+#
+# -------------------------------------------
+
+
+def test_save_many_commits_in_chunks_of_max_batch_size(db):
+    books = [Book.make(title=str(i)) for i in range(1201)]
+    Book.save_many(books)
+    assert sorted(db.commits) == [201, 500, 500]
+    assert len(db.store("books")) == 1201
+
+
+def test_save_many_keeps_the_last_write_for_repeated_documents(db):
+    first = Flat.make(name="first")
+    last = Flat.make(doc_id=first.id, name="last")
+    Flat.save_many([first] * 600 + [last])
+    assert Flat.get(first.id).name == "last"
+
+
+def test_save_many_only_starts_threads_for_several_commits(db, monkeypatch):
+    pools = []
+
+    class RecordingExecutor(ThreadPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(firestore_model, "ThreadPoolExecutor", RecordingExecutor)
+    Flat.save_many([Flat.make(name=str(i)) for i in range(3)])
+    with Flat.batch():
+        Flat.save_many([Flat.make(name=str(i)) for i in range(600)])
+    assert pools == []
+    Flat.save_many([Flat.make(name=str(i)) for i in range(501)])
+    assert len(pools) == 1
+    assert len(db.store("flats")) == 1104
+
+
+def test_delete_many(db):
+    saved = Flat.save_many([Flat.make(name=str(i)) for i in range(3)])
+    Flat.delete_many([f.id for f in saved])
+    assert db.store("flats") == {}
+
+
+def test_batch_commits_on_exit(db):
+    with Model.batch():
+        f = Flat.make(name="a", save=True)
+        assert db.store("flats") == {}
+    assert Flat.get(f.id) == f
+    assert db.commits == [1]
+
+
+def test_batch_discards_writes_when_the_block_raises(db):
+    with pytest.raises(ValueError):
+        with Model.batch():
+            Flat.make(name="a", save=True)
+            raise ValueError()
+    assert db.store("flats") == {}
+
+
+# --------------------------------------------
+#
+#  Caches
+#
+# -------------------------------------------
+
+
+def test_get_from_cache(db):
+    f = Flat.make(name="a", save=True)
+    Flat.get(f.id, source="cache")
+    reads = db.reads
+    assert Flat.get(f.id, source="cache") == f
+    assert db.reads == reads
+
+
+def test_server_reads_do_not_fill_the_cache(db):
+    f = Flat.make(name="a", save=True)
+    Flat.get(f.id)
+    reads = db.reads
+    Flat.get(f.id, source="cache")
+    assert db.reads == reads + 1
+
+
+def test_cache_evicts_expired_entries_first():
+    cache = firestore_model._TTLCache(maxsize=2)
+    cache.set("old", 1, ttl=-1)
+    cache.set("fresh", 2, ttl=60)
+    cache.set("new", 3, ttl=60)
+    assert cache.get("fresh") == 2
+    assert cache.get("new") == 3
+
+
+def test_cache_is_invalidated_by_writes(db):
+    f = Flat.make(name="a", save=True)
+    Flat.get(f.id, source="cache")
+    f.name = "b"
+    f.save()
+    assert Flat.get(f.id, source="cache").name == "b"
+    f.delete()
+    assert Flat.get(f.id, source="cache") is None
+
+
+def test_cache_is_invalidated_after_batch_commit(db):
+    f = Flat.make(name="a", save=True)
+    with Model.batch():
+        f.name = "b"
+        f.save()
+        # read between queueing and committing caches the old server data
+        assert Flat.get(f.id, source="cache").name == "a"
+    assert Flat.get(f.id, source="cache").name == "b"
+
+
+def test_cached_documents_are_not_shared(db):
+    b = Book.make(title="a", tags=["x"], save=True)
+    Book.get(b.id, source="cache").tags.append("changed")
+    assert Book.get(b.id, source="cache").tags == ["x"]
+
+
+def test_unknown_source():
+    with pytest.raises(ValueError):
+        Flat.get("a", source="nowhere")
+
+
+def test_query_cache(db):
+    Flat.make(name="a", save=True)
+    first = list(Flat.query([("name", "a")], cache_ttl=60).get())
+    Flat.make(name="a", save=True)
+    second = list(Flat.query([("name", "a")], cache_ttl=60).get())
+    assert len(first) == len(second) == 1
+    assert len(list(Flat.query([("name", "a")]).get())) == 2
+
+    second[0].count = 10
+    third = list(Flat.query([("name", "a")], cache_ttl=60).get())
+    assert third[0].count == 0
+
+
+def test_query_cache_is_cleared_by_set_db(db):
+    Flat.make(name="a", save=True)
+    list(Flat.query([("name", "a")], cache_ttl=60).get())
+    firestore_model.set_db(type(db)())
+    assert list(Flat.query([("name", "a")], cache_ttl=60).get()) == []
+
+
+def test_caches_are_cleared_when_db_is_assigned_directly(db):
+    f = Flat.make(name="a", save=True)
+    Flat.get(f.id, source="cache")
+    list(Flat.query([("name", "a")], cache_ttl=60).get())
+    firestore_model.db = type(db)()
+    assert Flat.get(f.id, source="cache") is None
+    assert list(Flat.query([("name", "a")], cache_ttl=60).get()) == []
+
+
+# --------------------------------------------
+#
+#  Queries
+#
+# -------------------------------------------
+
+
+def test_query_get_and_materialize(db):
+    Flat.save_many([Flat.make(name="a", count=i) for i in range(5)])
+    Flat.make(name="b", save=True)
+    assert sorted(f.count for f in Flat.query([("name", "a")]).get()) == list(range(5))
+    assert len(Flat.query([("name", "a")]).materialize()) == 5
+
+
+def test_materialize_uses_the_query_cache(db):
+    Flat.make(name="a", save=True)
+    query = Flat.query([("name", "a")], cache_ttl=60)
+    first = query.materialize()
+    streams = db.streams
+    second = Flat.query([("name", "a")], cache_ttl=60).materialize()
+    assert db.streams == streams
+    assert second == first
+    assert second[0] is not first[0]
+
+
+def test_select_fetches_only_the_selected_fields(db):
+    saved = Flat.make(name="a", count=3, save=True)
+    fields = ["id", "created", "modified", "collection_path", "name"]
+    (flat,) = Flat.query().select(*fields).get()
+    assert db.projections == [fields]
+    assert flat.id == saved.id
+    assert flat.name == "a"
+    assert flat.count == 0
+
+
+def test_select_with_every_field_hydrates_the_whole_model(db):
+    saved = Flat.make(name="a", count=3, save=True)
+    fields = ["id", "created", "modified", "collection_path", "name", "count"]
+    (flat,) = Flat.query().select(*fields).materialize()
+    assert flat == saved
+
+
+def test_select_bypasses_the_query_cache(db):
+    Flat.make(name="a", count=3, save=True)
+    fields = ["id", "created", "modified", "collection_path", "name"]
+    assert [f.count for f in Flat.query(cache_ttl=60).get()] == [3]
+    selected = list(Flat.query(cache_ttl=60).select(*fields).get())
+    assert [f.count for f in selected] == [0]
+    assert db.streams == 2
+    assert [f.count for f in Flat.query(cache_ttl=60).get()] == [3]
+    assert db.streams == 2
+
+
+def test_get_columns(db):
+    Book.save_many([Book.make(title=str(i), year=1950 + i) for i in range(10)])
+    columns = Book.query().get_columns(["title", "year"])
+    assert sorted(columns["title"]) == sorted(str(i) for i in range(10))
+    assert sorted(columns["year"]) == list(range(1950, 1960))
+
+
+def test_filter_numeric(db):
+    Book.save_many([Book.make(title=str(i), year=1950 + i) for i in range(10)])
+    columns = Book.query().get_columns(["title", "year"])
+    result = firestore_model.Query.filter_numeric(
+        columns, lambda years: [y >= 1955 for y in years], ["year"]
+    )
+    assert sorted(result["year"]) == list(range(1955, 1960))
+
+
+def test_filter_numeric_rejects_a_mask_of_the_wrong_length(db):
+    columns = {"year": [1950, 1960, 1970]}
+    with pytest.raises(ValueError):
+        firestore_model.Query.filter_numeric(columns, lambda years: [True], ["year"])
+
+
+def test_filter_numeric_with_numpy_columns(db):
+    numpy = pytest.importorskip("numpy")
+    Book.save_many(
+        [Book.make(title=str(i), year=1950 + i, pages=100 * i) for i in range(10)]
+    )
+
+    # written the way a numba.njit kernel would be: an explicit loop over arrays
+    def recent_and_short(years, pages):
+        mask = numpy.empty(len(years), dtype=numpy.bool_)
+        for i in range(len(years)):
+            mask[i] = years[i] >= 1955 and pages[i] < 800
+        return mask
+
+    columns = Book.query().get_columns(["title", "year", "pages"])
+    result = firestore_model.Query.filter_numeric(
+        columns, recent_and_short, ["year", "pages"]
+    )
+    assert isinstance(result["year"], numpy.ndarray)
+    assert sorted(result["year"].tolist()) == [1955, 1956, 1957]
+    assert sorted(result["title"]) == ["5", "6", "7"]
+
+
+def test_get_columns_converts_only_well_typed_columns_to_numpy(db):
+    numpy = pytest.importorskip("numpy")
+    Book.make(title="a", year=1959, save=True)
+    b = Book.make(title="b", year=1960, save=True)
+    columns = Book.query().get_columns(["year"])
+    assert isinstance(columns["year"], numpy.ndarray)
+    assert columns["year"].dtype.kind == "i"
+
+    db.store("books")[b.id]["year"] = 2.7
+    columns = Book.query().get_columns(["year"])
+    assert isinstance(columns["year"], list)
+    assert sorted(columns["year"]) == [2.7, 1959]
+
+
+def test_get_columns_keeps_mistyped_values(db):
+    Book.make(title="a", year=1959, save=True)
+    b = Book.make(title="b", save=True)
+    db.store("books")[b.id]["year"] = 2.7
+    columns = Book.query().get_columns(["year"])
+    assert sorted(columns["year"]) == [2.7, 1959]
+    assert isinstance(columns["year"], list)